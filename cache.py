@@ -0,0 +1,51 @@
+import redis.asyncio as redis
+import logging
+import os
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Caching is optional: without REDIS_URL every lookup is a miss
+_redis: Optional[redis.Redis] = None
+
+
+async def init_cache():
+    global _redis
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        _redis = redis.from_url(redis_url)
+
+
+async def close_cache():
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+def cache_enabled() -> bool:
+    return _redis is not None
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    if _redis is None:
+        return None
+    try:
+        return await _redis.get(key)
+    except redis.RedisError as e:
+        # A cache outage should only cost us the database round-trip
+        logger.warning(f"Cache get failed for {key}: {str(e)}")
+        return None
+
+
+async def cache_set(key: str, value: bytes, ttl: int):
+    if _redis is None:
+        return
+    try:
+        await _redis.set(key, value, ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Cache set failed for {key}: {str(e)}")
@@ -0,0 +1,16 @@
+def accepts_gzip(accept_encoding: str) -> bool:
+    # Honour q-values, so "gzip;q=0" is a refusal; an explicit gzip entry
+    # takes precedence over "*"
+    qvalues = {}
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[name.strip().lower()] = q
+    return qvalues.get("gzip", qvalues.get("*", 0.0)) > 0
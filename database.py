@@ -1,32 +1,47 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from fastapi import HTTPException
-from contextlib import contextmanager
+import asyncpg
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-@contextmanager
-def get_db_cursor():
-    conn = None
-    try:
-        conn = psycopg2.connect(
-            host="db.igbrtovzwzggsshovtak.supabase.co",
-            database="postgres",
-            user="postgres",
-            password="repeetcodedb9926*",  
-            port=5432,
-            cursor_factory=RealDictCursor
-        )
-        cursor = conn.cursor()
-        yield cursor
-        conn.commit()
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise HTTPException(500, f"Database error: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
+# DB_URL should point at Supabase's PgBouncer (port 6543, transaction
+# pooling) rather than Postgres on 5432, e.g.
+#   postgresql://postgres:<password>@db.<ref>.supabase.co:6543/postgres
+# Transaction pooling means no session state: never SET SESSION, LISTEN,
+# or rely on server-side prepared statements across transactions.
+# Each worker keeps a couple of warm connections to the pooler, which
+# multiplexes them onto a small number of Postgres backends.
+_pool: Optional[asyncpg.Pool] = None
+
+
+async def init_pool():
+    global _pool
+    _pool = await asyncpg.create_pool(
+        os.environ["DB_URL"],
+        min_size=int(os.getenv("DB_POOL_MIN", 2)),
+        max_size=int(os.getenv("DB_POOL_MAX", 20)),
+        # asyncpg prepares each distinct query once per connection and
+        # reuses the plan, but prepared statements do not survive
+        # transaction pooling, so this stays 0 behind PgBouncer. With a
+        # direct or session-mode DB_URL, set it (asyncpg defaults to 100)
+        statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", 0)),
+        ssl="require",
+    )
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def acquire():
+    return _pool.acquire()
+
+
+async def get_conn():
+    async with _pool.acquire() as conn:
+        yield conn
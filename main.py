@@ -1,16 +1,27 @@
-from fastapi import FastAPI, Depends, HTTPException, Header
+from fastapi import FastAPI, Depends, HTTPException, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 # Firebase (Auth only)
 from firebase_admin import auth 
-from database import get_db_cursor  
-import psycopg2  
-from pydantic import BaseModel
+from database import init_pool, close_pool, get_conn, acquire
+from cache import init_cache, close_cache, cache_enabled, cache_get, cache_set
+from token_cache import get_cached_uid, cache_uid
+from compression import accepts_gzip
+import asyncpg
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field
 from typing import Optional
-from datetime import datetime, timedelta, time, timezone
+import hashlib
+from datetime import datetime, timedelta, timezone
 import firebase_admin
 from firebase_admin import credentials
 import logging
 import json
+import gzip
+import orjson
 from google.oauth2 import service_account
 import os
 
@@ -29,7 +40,24 @@ if not firebase_admin._apps:
     
     firebase_admin.initialize_app(cred)
 
-app = FastAPI()
+class RecordJSONResponse(ORJSONResponse):
+    # asyncpg Records go straight to orjson, skipping FastAPI's
+    # jsonable_encoder pass and any per-row dict copies in Python
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=dict)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_pool()
+    await init_cache()
+    yield
+    await close_cache()
+    await close_pool()
+    _auth_executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 origins = [
     "http://localhost:3000",         
@@ -45,42 +73,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Responses that already set Content-Encoding (e.g. /problem_bank) pass through
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 @app.get("/")
 def root():
     return {"message": "RepeetCode backend is live!"}
 
 
-def calculate_current_streak(dates: list[str]) -> int:
-    if not dates:
-        return 0
-    logged_days = set(datetime.fromisoformat(d).date() for d in dates)
-    streak = 0
-    today = datetime.utcnow().date()
-    while today in logged_days:
-        streak += 1
-        today -= timedelta(days=1)
-    return streak
+async def get_current_streak(conn: asyncpg.Connection, user_id: str) -> int:
+    # Consecutive days share the same (day - row_number) value, so the
+    # streak is the size of the run containing today
+    return await conn.fetchval("""
+        WITH days AS (
+            SELECT DISTINCT (date_solved AT TIME ZONE 'UTC')::date AS day
+            FROM user_problem
+            WHERE user_id = $1 AND (date_solved AT TIME ZONE 'UTC')::date <= $2
+        ),
+        runs AS (
+            SELECT day, day - (ROW_NUMBER() OVER (ORDER BY day))::int AS grp
+            FROM days
+        )
+        SELECT COUNT(*) FROM runs
+        WHERE grp = (SELECT grp FROM runs WHERE day = $2)
+    """, user_id, datetime.now(timezone.utc).date())
+
+# firebase_admin verifies tokens synchronously (RSA math, occasional JWKS
+# fetch), so cache misses run here instead of on the event loop or the
+# default executor shared with everything else
+_auth_executor = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 4,
+    thread_name_prefix="auth",
+)
 
 
-def get_user_problem_logs(user_id: str):
-    try:
-        with get_db_cursor() as cur:
-            cur.execute("""
-                SELECT * FROM user_problem 
-                WHERE user_id = %s
-                ORDER BY date_solved DESC
-            """, (user_id,))
-            return cur.fetchall()
-    except Exception as e:
-        logger.error(f"Error fetching user logs: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error fetching user logs: {str(e)}")
-
-def verify_token(authorization: Optional[str] = Header(None)) -> str:
+async def verify_token(authorization: Optional[str] = Header(None)) -> str:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
     token = authorization.split("Bearer ")[1]
+    token_hash = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    uid = get_cached_uid(token_hash)
+    if uid is not None:
+        return uid
     try:
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await asyncio.get_running_loop().run_in_executor(
+            _auth_executor, auth.verify_id_token, token
+        )
+        # Failures raise above and are never cached
+        cache_uid(token_hash, decoded_token['uid'], decoded_token['exp'])
         return decoded_token['uid']
     except Exception as e:
         logger.error(f"Token verification failed: {str(e)}")
@@ -90,225 +130,224 @@ def verify_token(authorization: Optional[str] = Header(None)) -> str:
 class ProblemLog(BaseModel):
     slug: str
     title: str
-    difficulty: int  # user-rated 1–5
+    difficulty: int = Field(ge=1, le=5)  # user-rated 1–5
 
 
 @app.get("/dashboard_stats")
-def dashboard_stats(user_id: str = Depends(verify_token)):
+async def dashboard_stats(
+    user_id: str = Depends(verify_token),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
     try:
-        problem_logs = get_user_problem_logs(user_id)
-        timestamps = [log['date_solved'].isoformat() for log in problem_logs]
-        streak = calculate_current_streak(timestamps)
+        streak = await get_current_streak(conn, user_id)
         return {"current_streak": streak}
     except Exception as e:
         logger.error(f"Error in dashboard_stats: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching dashboard stats: {str(e)}")
 
 
+# Indexed by difficulty - 1.
+# If never reviewed before, review sooner for harder problems
+INITIAL_DAYS = (8, 6, 4, 2, 1)
+# Harder problems reviewed more often → smaller multiplier
+# So inverse of difficulty scale: easier = larger gap
+MULTIPLIER = (0.5, 0.7, 0.9, 1.2, 1.5)
+
+
 def calculate_next_review(difficulty: int, last_review_date: Optional[datetime]) -> datetime:
-    now = datetime.utcnow()
+    now = datetime.now(timezone.utc)
 
-    # If never reviewed before, review sooner for harder problems
-    initial_days = {1: 8, 2: 6, 3: 4, 4: 2, 5: 1}
     if not last_review_date:
-        return now + timedelta(days=initial_days[difficulty])
+        return now + timedelta(days=INITIAL_DAYS[difficulty - 1])
 
     days_since_last = (now - last_review_date).days
-
-    # Harder problems reviewed more often → smaller multiplier
-    # So inverse of difficulty scale: easier = larger gap
-    multiplier = {1: 0.5, 2: 0.7, 3: 0.9, 4: 1.2, 5: 1.5}
-    next_gap = max(1, int(days_since_last * multiplier[difficulty]))
+    next_gap = max(1, int(days_since_last * MULTIPLIER[difficulty - 1]))
 
     return now + timedelta(days=min(next_gap, 90))
 
-    return now + timedelta(days=min(next_gap, 90))
+
 @app.post("/log")
-def log_problem(data: ProblemLog, user_id: str = Depends(verify_token)):
+async def log_problem(
+    data: ProblemLog,
+    user_id: str = Depends(verify_token),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
     try:
         logger.info(f"Logging problem for user {user_id}: {data}")
-        with get_db_cursor() as cur:
-            # 1. Check if problem exists
-            logger.info(f"Checking if problem exists: {data.slug}")
-            cur.execute("SELECT 1 FROM leetcode_problem WHERE slug = %s", (data.slug,))
-            if not cur.fetchone():
-                raise HTTPException(400, "Problem does not exist in database")
-
-            # 2. Get tags
-            cur.execute("SELECT tags FROM leetcode_problem WHERE slug = %s", (data.slug,))
-            result = cur.fetchone()
-            tags = result['tags'] if result and result['tags'] is not None else []
-
-            # --- FIX HERE ---
-            if isinstance(tags, dict):
-                tags = list(tags.keys())
-            elif tags is None:
-                tags = []
-            # --- END FIX ---
-
-            logger.info(f"Tags: {tags}")
-
-            # 3. Last review
-            cur.execute("""
-                SELECT date_solved FROM user_problem 
-                WHERE user_id = %s AND slug = %s
-                ORDER BY date_solved DESC LIMIT 1
-            """, (user_id, data.slug))
-            last_review = cur.fetchone()
-
-            # 4. Next review
-            next_review = calculate_next_review(
-                data.difficulty,
-                last_review['date_solved'] if last_review else None
+        # Each statement autocommits: the read is advisory and the upsert
+        # is atomic on its own, so an explicit transaction would only add
+        # BEGIN/COMMIT round-trips
+
+        # 1. Last review
+        last_solved = await conn.fetchval("""
+            SELECT date_solved FROM user_problem
+            WHERE user_id = $1 AND slug = $2
+            ORDER BY date_solved DESC LIMIT 1
+        """, user_id, data.slug)
+
+        # 2. Next review
+        next_review = calculate_next_review(data.difficulty, last_solved)
+
+        # 3. Insert/upsert, copying tags straight from leetcode_problem.
+        # Nothing is inserted when the problem does not exist
+        status = await conn.execute("""
+            INSERT INTO user_problem (
+                user_id, slug, title, difficulty, 
+                date_solved, next_review_date, tags
             )
+            SELECT $1, lp.slug, $3, $4, $5, $6, lp.tags
+            FROM leetcode_problem lp
+            WHERE lp.slug = $2
+            ON CONFLICT (user_id, slug) 
+            DO UPDATE SET
+                difficulty = EXCLUDED.difficulty,
+                date_solved = EXCLUDED.date_solved,
+                next_review_date = EXCLUDED.next_review_date,
+                tags = EXCLUDED.tags
+        """,
+            user_id, data.slug, data.title, data.difficulty,
+            datetime.now(timezone.utc), next_review
+        )
+        if status == "INSERT 0 0":
+            raise HTTPException(400, "Problem does not exist in database")
 
-            # 5. Insert/upsert
-            cur.execute("""
-                INSERT INTO user_problem (
-                    user_id, slug, title, difficulty, 
-                    date_solved, next_review_date, tags
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (user_id, slug) 
-                DO UPDATE SET
-                    difficulty = EXCLUDED.difficulty,
-                    date_solved = EXCLUDED.date_solved,
-                    next_review_date = EXCLUDED.next_review_date,
-                    tags = EXCLUDED.tags
-            """, (
-                user_id, data.slug, data.title, data.difficulty,
-                datetime.now(timezone.utc), next_review, json.dumps(tags)
-            ))
-
-            logger.info("Problem logged successfully")
-
-            return {
-                "message": f"{data.title} logged!",
-                "next_review": next_review.date().isoformat()
-            }
+        logger.info("Problem logged successfully")
 
+        return {
+            "message": f"{data.title} logged!",
+            "next_review": next_review.date()
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error logging problem")
         raise HTTPException(status_code=500, detail=f"Internal log error: {str(e)}")
 
 @app.get("/reviews")
-def get_todays_reviews(user_id: str = Depends(verify_token)):
+async def get_todays_reviews(
+    user_id: str = Depends(verify_token),
+    conn: asyncpg.Connection = Depends(get_conn),
+):
     try:
         logger.info(f"Fetching reviews for user: {user_id}")
-        today_end = datetime.combine(datetime.utcnow().date(), time(23, 59, 59))
+        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow_start = today_start + timedelta(days=1)
         
-        with get_db_cursor() as cur:
-            # Due reviews
-            logger.info("Executing due reviews query")
-            cur.execute("""
-                SELECT up.*, lp.tags 
+        # Due reviews, or the next upcoming one when nothing is due, in a
+        # single round-trip
+        logger.info("Executing reviews query")
+        rows = await conn.fetch("""
+            WITH due AS (
+                SELECT
+                    up.user_id,
+                    up.slug,
+                    up.title,
+                    up.difficulty,
+                    up.date_solved,
+                    up.next_review_date,
+                    lp.tags
                 FROM user_problem up
                 JOIN leetcode_problem lp ON up.slug = lp.slug
-                WHERE up.user_id = %s AND up.next_review_date <= %s
-            """, (user_id, today_end))
-            due_reviews = cur.fetchall()
-            
-            logger.info(f"Found {len(due_reviews)} due reviews")
-            
-            if due_reviews:
-                # Convert datetime objects to ISO format strings for JSON serialization
-                serialized_reviews = []
-                for review in due_reviews:
-                    review_dict = dict(review)
-                    # Convert datetime fields to strings
-                    if 'date_solved' in review_dict and review_dict['date_solved']:
-                        review_dict['date_solved'] = review_dict['date_solved'].isoformat()
-                    if 'next_review_date' in review_dict and review_dict['next_review_date']:
-                        review_dict['next_review_date'] = review_dict['next_review_date'].isoformat()
-                    serialized_reviews.append(review_dict)
-                
-                return {"reviews_due": serialized_reviews}
-            
-            # Next upcoming review
-            logger.info("No due reviews, fetching next upcoming")
-            cur.execute("""
-                SELECT up.*, lp.tags 
+                WHERE up.user_id = $1 AND up.next_review_date < $2
+            )
+            SELECT * FROM due
+            UNION ALL
+            (
+                SELECT
+                    up.user_id,
+                    up.slug,
+                    up.title,
+                    up.difficulty,
+                    up.date_solved,
+                    up.next_review_date,
+                    lp.tags
                 FROM user_problem up
                 JOIN leetcode_problem lp ON up.slug = lp.slug
-                WHERE up.user_id = %s
+                WHERE up.user_id = $1 AND NOT EXISTS (SELECT 1 FROM due)
                 ORDER BY up.next_review_date ASC
                 LIMIT 1
-            """, (user_id,))
-            next_up = cur.fetchone()
-            
-            if next_up:
-                next_up_dict = dict(next_up)
-                # Convert datetime fields to strings
-                if 'date_solved' in next_up_dict and next_up_dict['date_solved']:
-                    next_up_dict['date_solved'] = next_up_dict['date_solved'].isoformat()
-                if 'next_review_date' in next_up_dict and next_up_dict['next_review_date']:
-                    next_up_dict['next_review_date'] = next_up_dict['next_review_date'].isoformat()
-                
-                return {"reviews_due": [], "next_up": next_up_dict}
-            
-            return {"reviews_due": [], "next_up": None}
+            )
+        """, user_id, tomorrow_start)
+        
+        # Either every row is due or there is a single upcoming one. Due rows
+        # always have a next_review_date; the fallback row may not
+        first_review_date = rows[0]['next_review_date'] if rows else None
+        if first_review_date is not None and first_review_date < tomorrow_start:
+            logger.info(f"Found {len(rows)} due reviews")
+            return RecordJSONResponse({"reviews_due": rows})
+        
+        if rows:
+            return RecordJSONResponse({"reviews_due": [], "next_up": rows[0]})
+        
+        return {"reviews_due": [], "next_up": None}
             
     except Exception as e:
         logger.error(f"Error in get_todays_reviews: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching reviews: {str(e)}")
 
 
+ALL_PROBLEMS_PAGE_SIZE = 500
+
+# Keyset-paginated so /all_problems can stream any number of rows
+# without holding them all; (date_solved, slug) gives a stable order and
+# is served by idx_up_user_datesolved_slug.
+# Each page is read in its own snapshot. A problem the user re-logs while
+# the response is streaming moves to the front of the order (date_solved
+# becomes now) and is missing from this response; the next load has it.
+# Columns are aliased to the response fields so rows serialize as-is
+ALL_PROBLEMS_SQL = """
+    SELECT 
+        up.slug,
+        up.title,
+        up.difficulty,
+        up.date_solved,
+        up.next_review_date,
+        COALESCE(NULLIF(up.tags, '{{}}'), lp.tags, '{{}}') AS tags,
+        lp.official_difficulty
+    FROM user_problem up
+    JOIN leetcode_problem lp ON up.slug = lp.slug
+    WHERE up.user_id = $1 {after}
+    ORDER BY up.date_solved DESC, up.slug DESC
+    LIMIT {limit}
+"""
+
+
+async def fetch_problems_page(user_id: str, after: Optional[asyncpg.Record] = None):
+    if after is None:
+        sql = ALL_PROBLEMS_SQL.format(after="", limit=ALL_PROBLEMS_PAGE_SIZE)
+        args = (user_id,)
+    else:
+        sql = ALL_PROBLEMS_SQL.format(
+            after="AND (up.date_solved, up.slug) < ($2, $3)",
+            limit=ALL_PROBLEMS_PAGE_SIZE,
+        )
+        args = (user_id, after['date_solved'], after['slug'])
+    # A connection per page, so a slow client never pins one from the pool
+    async with acquire() as conn:
+        return await conn.fetch(sql, *args)
+
+
+async def stream_all_problems(user_id: str, page: list[asyncpg.Record]):
+    yield b'{"all_problems":['
+    first = True
+    while page:
+        # Serialize the page as a list and strip its brackets
+        chunk = orjson.dumps(page, default=dict)[1:-1]
+        yield chunk if first else b"," + chunk
+        first = False
+        if len(page) < ALL_PROBLEMS_PAGE_SIZE:
+            break
+        page = await fetch_problems_page(user_id, page[-1])
+    yield b"]}"
+
+
 @app.get("/all_problems")
-def get_all_problems(user_id: str = Depends(verify_token)):
+async def get_all_problems(user_id: str = Depends(verify_token)):
     try:
-        with get_db_cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    up.slug,
-                    up.title,
-                    up.difficulty AS user_difficulty,
-                    up.date_solved,
-                    up.next_review_date,
-                    up.tags AS user_tags,
-                    lp.official_difficulty,
-                    lp.tags AS official_tags
-                FROM user_problem up
-                JOIN leetcode_problem lp ON up.slug = lp.slug
-                WHERE up.user_id = %s
-                ORDER BY up.date_solved DESC
-            """, (user_id,))
-            
-            problems = []
-            for row in cur.fetchall():
-                # Parse tags JSON strings to Python objects if needed
-                user_tags = row['user_tags']
-                official_tags = row['official_tags']
-
-                # The tags might be stored as JSON strings (text) or native JSONB
-                # Ensure both are Python objects (lists or dicts)
-                if isinstance(user_tags, str):
-                    user_tags = json.loads(user_tags)
-                if isinstance(official_tags, str):
-                    official_tags = json.loads(official_tags)
-
-                # Fix tags to always be lists
-                def fix_tags(t):
-                    if isinstance(t, dict):
-                        return list(t.keys())
-                    elif isinstance(t, list):
-                        return t
-                    else:
-                        return []
-                
-                tags = fix_tags(user_tags) or fix_tags(official_tags) or []
-
-                problem_dict = {
-                    "slug": row['slug'],
-                    "title": row['title'],
-                    "difficulty": row['user_difficulty'],
-                    "date_solved": row['date_solved'].isoformat() if row['date_solved'] else None,
-                    "next_review_date": row['next_review_date'].isoformat() if row['next_review_date'] else None,
-                    "tags": tags,
-                    "official_difficulty": row['official_difficulty']
-                }
-                problems.append(problem_dict)
-            
-            return {"all_problems": problems}
-            
+        # Fetch the first page up front so database errors still become a
+        # 500 instead of a truncated body
+        first_page = await fetch_problems_page(user_id)
     except Exception as e:
         logger.error(f"Error in get_all_problems: {str(e)}")
         raise HTTPException(
@@ -316,23 +355,54 @@ def get_all_problems(user_id: str = Depends(verify_token)):
             detail=f"Failed to fetch user problems: {str(e)}"
         )
 
+    return StreamingResponse(
+        stream_all_problems(user_id, first_page),
+        media_type="application/json",
+    )
+
+
+# Bump the version whenever the cached payload's shape changes
+PROBLEM_BANK_CACHE_KEY = "problem_bank:v3"
+PROBLEM_BANK_CACHE_TTL = 300  # seconds
+
+
+def json_response(body: bytes, gzipped: bool = False) -> Response:
+    # Vary only when we picked the gzipped body ourselves; plain bodies
+    # get it from GZipMiddleware if it compresses them
+    headers = {"Content-Encoding": "gzip", "Vary": "Accept-Encoding"} if gzipped else None
+    return Response(body, media_type="application/json", headers=headers)
+
 
 @app.get("/problem_bank")
-def get_problem_bank(user_id: str = Depends(verify_token)):
+async def get_problem_bank(request: Request, user_id: str = Depends(verify_token)):
     try:
-        with get_db_cursor() as cur:
-            cur.execute("""
+        # The bank only changes when problems are imported, so serve the
+        # pre-serialized, pre-compressed JSON from the cache when we can
+        cached = await cache_get(PROBLEM_BANK_CACHE_KEY)
+        if cached is not None:
+            if accepts_gzip(request.headers.get("accept-encoding", "")):
+                return json_response(cached, gzipped=True)
+            return json_response(gzip.decompress(cached))
+
+        async with acquire() as conn:
+            problems = await conn.fetch("""
                 SELECT slug, title, official_difficulty, tags
                 FROM leetcode_problem
             """)
-            problems = cur.fetchall()
-            
-            # Convert to list of dicts for JSON serialization
-            problems_list = []
-            for problem in problems:
-                problems_list.append(dict(problem))
-            
-            return {"problems": problems_list}
+        
+        body = orjson.dumps({"problems": problems}, default=dict)
+        if not cache_enabled():
+            # Nothing to amortize the compression over; GZipMiddleware
+            # compresses this response like any other
+            return json_response(body)
+
+        # Compressed once per cache fill, so spend the CPU on a high level,
+        # off the event loop
+        compressed = await asyncio.to_thread(gzip.compress, body, compresslevel=9)
+        await cache_set(PROBLEM_BANK_CACHE_KEY, compressed, PROBLEM_BANK_CACHE_TTL)
+        if accepts_gzip(request.headers.get("accept-encoding", "")):
+            return json_response(compressed, gzipped=True)
+        return json_response(body)
     except Exception as e:
         logger.error(f"Error in get_problem_bank: {str(e)}")
         raise HTTPException(500, detail=f"Failed to fetch problem bank: {str(e)}")
\ No newline at end of file
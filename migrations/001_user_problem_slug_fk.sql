@@ -0,0 +1,37 @@
+-- /log no longer checks that a problem exists before upserting it;
+-- unknown slugs are rejected by this constraint instead.
+-- Safe to re-run, and skipped if a slug foreign key already exists under
+-- any name. Run the two statements separately (psql autocommit) so the
+-- validation scan does not hold the lock taken by ADD CONSTRAINT.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE contype = 'f'
+          AND conrelid = 'user_problem'::regclass
+          AND confrelid = 'leetcode_problem'::regclass
+    ) THEN
+        ALTER TABLE user_problem
+            ADD CONSTRAINT fk_slug
+            FOREIGN KEY (slug) REFERENCES leetcode_problem (slug)
+            NOT VALID;
+    END IF;
+END $$;
+
+-- VALIDATE CONSTRAINT only takes a SHARE UPDATE EXCLUSIVE lock, so
+-- reads and writes carry on while existing rows are checked
+DO $$
+DECLARE
+    fk name;
+BEGIN
+    FOR fk IN
+        SELECT conname FROM pg_constraint
+        WHERE contype = 'f'
+          AND NOT convalidated
+          AND conrelid = 'user_problem'::regclass
+          AND confrelid = 'leetcode_problem'::regclass
+    LOOP
+        EXECUTE format('ALTER TABLE user_problem VALIDATE CONSTRAINT %I', fk);
+    END LOOP;
+END $$;
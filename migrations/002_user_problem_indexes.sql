@@ -0,0 +1,14 @@
+-- Indexes for the per-user queries on user_problem:
+--   /reviews       filters on (user_id, next_review_date)
+--   /all_problems  pages by (user_id, date_solved DESC, slug DESC)
+--   /log           upserts on (user_id, slug), which is already covered by
+--                  the unique index ON CONFLICT (user_id, slug) requires
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so
+-- run these statements one at a time (e.g. psql without --single-transaction).
+-- Check with EXPLAIN (ANALYZE, BUFFERS) that /reviews uses an Index Scan.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_up_user_nextreview
+    ON user_problem (user_id, next_review_date);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_up_user_datesolved_slug
+    ON user_problem (user_id, date_solved DESC, slug DESC);
@@ -0,0 +1,42 @@
+-- Store tags as native text[] on both tables. The jsonb values written so
+-- far are either arrays of tag names, objects keyed by tag name, or a
+-- JSON-encoded string holding one of those.
+-- Columns that are already text[] are left alone.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION pg_temp.tags_to_text_array(raw jsonb) RETURNS text[]
+LANGUAGE sql IMMUTABLE AS $$
+    WITH t AS (
+        SELECT CASE
+            WHEN jsonb_typeof(raw) = 'string' THEN (raw #>> '{}')::jsonb
+            ELSE raw
+        END AS tags
+    )
+    SELECT CASE jsonb_typeof(tags)
+        WHEN 'array' THEN ARRAY(SELECT jsonb_array_elements_text(tags))
+        WHEN 'object' THEN ARRAY(SELECT jsonb_object_keys(tags))
+        ELSE '{}'::text[]
+    END
+    FROM t
+$$;
+
+DO $$
+DECLARE
+    tbl text;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['leetcode_problem', 'user_problem'] LOOP
+        IF (
+            SELECT data_type FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = tbl AND column_name = 'tags'
+        ) = 'jsonb' THEN
+            EXECUTE format(
+                'ALTER TABLE %I ALTER COLUMN tags TYPE text[] USING pg_temp.tags_to_text_array(tags)',
+                tbl
+            );
+        END IF;
+    END LOOP;
+END $$;
+
+COMMIT;
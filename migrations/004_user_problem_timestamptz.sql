@@ -0,0 +1,21 @@
+-- The app now writes timezone-aware UTC datetimes. Convert the review
+-- timestamps to timestamptz, treating existing naive values as UTC.
+-- Columns that are already timestamptz are left alone.
+
+DO $$
+DECLARE
+    col text;
+BEGIN
+    FOREACH col IN ARRAY ARRAY['date_solved', 'next_review_date'] LOOP
+        IF (
+            SELECT data_type FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'user_problem' AND column_name = col
+        ) = 'timestamp without time zone' THEN
+            EXECUTE format(
+                'ALTER TABLE user_problem ALTER COLUMN %I TYPE timestamptz USING %I AT TIME ZONE ''UTC''',
+                col, col
+            );
+        END IF;
+    END LOOP;
+END $$;
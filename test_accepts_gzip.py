@@ -0,0 +1,32 @@
+from compression import accepts_gzip
+
+
+def test_gzip_accepted():
+    assert accepts_gzip("gzip")
+    assert accepts_gzip("deflate, gzip, br")
+
+
+def test_gzip_with_zero_q_is_refused():
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("gzip; q=0.0")
+
+
+def test_wildcard_accepts_gzip():
+    assert accepts_gzip("*")
+
+
+def test_explicit_gzip_overrides_wildcard():
+    assert not accepts_gzip("gzip;q=0, *")
+    assert not accepts_gzip("*, gzip;q=0")
+
+
+def test_empty_header_is_refused():
+    assert not accepts_gzip("")
+
+
+def test_malformed_q_is_refused():
+    assert not accepts_gzip("gzip;q=abc")
+
+
+def test_other_codings_only_are_refused():
+    assert not accepts_gzip("br, deflate")
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import token_cache
+from token_cache import cache_uid, get_cached_uid
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    token_cache._TOKEN_CACHE.clear()
+    yield
+    token_cache._TOKEN_CACHE.clear()
+
+
+def now() -> int:
+    return int(datetime.now(timezone.utc).timestamp())
+
+
+def test_returns_uid_for_valid_token():
+    cache_uid(b"a", "uid-a", now() + 3600)
+    assert get_cached_uid(b"a") == "uid-a"
+
+
+def test_miss_for_unknown_token():
+    assert get_cached_uid(b"missing") is None
+
+
+def test_expired_entry_is_evicted():
+    cache_uid(b"a", "uid-a", now() - 1)
+    assert get_cached_uid(b"a") is None
+    assert b"a" not in token_cache._TOKEN_CACHE
+
+
+def test_margin_forces_reverification():
+    cache_uid(b"a", "uid-a", now() + token_cache.TOKEN_EXPIRY_MARGIN - 5)
+    assert get_cached_uid(b"a") is None
+    assert b"a" not in token_cache._TOKEN_CACHE
+
+
+def test_size_cap_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(token_cache, "TOKEN_CACHE_MAX_SIZE", 2)
+    exp = now() + 3600
+    cache_uid(b"a", "uid-a", exp)
+    cache_uid(b"b", "uid-b", exp)
+    # Reading "a" makes "b" the least recently used entry
+    assert get_cached_uid(b"a") == "uid-a"
+    cache_uid(b"c", "uid-c", exp)
+    assert get_cached_uid(b"b") is None
+    assert get_cached_uid(b"a") == "uid-a"
+    assert get_cached_uid(b"c") == "uid-c"
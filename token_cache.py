@@ -0,0 +1,28 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+# Successfully verified ID tokens: blake2b(token) -> (uid, exp epoch).
+# Only touched from the event loop, so no locking is needed.
+_TOKEN_CACHE: "OrderedDict[bytes, tuple[str, int]]" = OrderedDict()
+TOKEN_CACHE_MAX_SIZE = 10_000
+TOKEN_EXPIRY_MARGIN = 30  # seconds; re-verify tokens this close to expiring
+
+
+def get_cached_uid(token_hash: bytes) -> Optional[str]:
+    entry = _TOKEN_CACHE.get(token_hash)
+    if entry is None:
+        return None
+    uid, exp = entry
+    if exp <= datetime.now(timezone.utc).timestamp() + TOKEN_EXPIRY_MARGIN:
+        del _TOKEN_CACHE[token_hash]
+        return None
+    _TOKEN_CACHE.move_to_end(token_hash)
+    return uid
+
+
+def cache_uid(token_hash: bytes, uid: str, exp: int):
+    _TOKEN_CACHE[token_hash] = (uid, exp)
+    _TOKEN_CACHE.move_to_end(token_hash)
+    if len(_TOKEN_CACHE) > TOKEN_CACHE_MAX_SIZE:
+        _TOKEN_CACHE.popitem(last=False)